@@ -1,3 +1,5 @@
+import bisect
+
 import sublime
 import sublime_plugin
 
@@ -68,6 +70,45 @@ SCHEME_TEMPLATE = """\
 KIND_SCHEME = (sublime.KIND_ID_VARIABLE, "s", "Scheme")
 DEFAULT_CS = 'Packages/Color Scheme - Default/Mariana.sublime-color-scheme'
 
+# Delay (ms) after the last modification before a view is re-decorated
+MODIFIED_DEBOUNCE_DELAY = 250
+# Comment regions at most this many characters apart are read with one substr
+COMMENT_READ_GAP = 4096
+
+
+class ViewState(object):
+
+    """Decoration state shared by the listener and commands for one view."""
+
+    def __init__(self) -> None:
+        # (change count, settings revision, syntax) of the last decoration pass
+        self.change = None
+        # Signature of the comment texts seen by the last decoration pass
+        self.comment_signature = None
+        # Begin offset of each comment block, matching applied_regions
+        self.block_begins = tuple()
+        # Region key -> (scope, flags, icon, extents) of the regions last drawn
+        self.applied_regions = dict()
+        # Number of debounced re-decorations still scheduled
+        self.pending_modifications = 0
+
+    def reset(self) -> None:
+        self.change = None
+        self.comment_signature = None
+        self.block_begins = tuple()
+        self.applied_regions = dict()
+
+
+# view id -> ViewState
+_view_states = dict()
+
+
+def get_view_state(view) -> ViewState:
+    state = _view_states.get(view.id())
+    if state is None:
+        state = _view_states[view.id()] = ViewState()
+    return state
+
 
 class ColoredCommentsEditSchemeCommand(sublime_plugin.WindowCommand):
 
@@ -129,53 +170,192 @@ class ColoredCommentsEventListener(sublime_plugin.EventListener):
         view.run_command("colored_comments")
 
     def on_modified_async(self, view):
-        view.run_command("colored_comments")
+        get_view_state(view).pending_modifications += 1
+        sublime.set_timeout_async(
+            lambda: self._run_after_modifications(view), MODIFIED_DEBOUNCE_DELAY
+        )
+
+    def _run_after_modifications(self, view):
+        state = _view_states.get(view.id())
+        if state is None:
+            return
+        state.pending_modifications -= 1
+        if state.pending_modifications > 0:
+            return
+        if view.is_valid():
+            view.run_command("colored_comments")
+
+    def on_close(self, view):
+        _view_states.pop(view.id(), None)
 
 
 class ColoredCommentsCommand(sublime_plugin.TextCommand):
     def run(self, edit):
-        if self.view.settings().get("syntax") in settings.disabled_syntax:
+        syntax = self.view.settings().get("syntax")
+        if syntax in settings.disabled_syntax:
+            return
+
+        # Init, load and explicit runs often arrive for a buffer that hasn't
+        # changed since it was last decorated. A syntax switch changes the
+        # comment scopes without touching the buffer, and another command may
+        # have erased our regions, so both are checked too.
+        state = get_view_state(self.view)
+        change = (self.view.change_count(), settings.revision, syntax)
+        if state.change == change and self.IsDecorated(state):
             return
 
         # self.ClearDecorations()
         self.ApplyDecorations()
+        state.change = change
 
     def ClearDecorations(self) -> None:
         for region_key in settings.region_keys:
             self.view.erase_regions(region_key)
+        get_view_state(self.view).reset()
 
     def ApplyDecorations(self) -> None:
-        to_decorate = dict()
-        prev_match = str()
-        for region in self.view.find_by_selector(comment_selector):
-            for reg in self.view.split_by_newlines(region):
-                line = self.view.substr(reg)
-                if not settings.get_matching_pattern().startswith(" "):
-                    line = line.strip()
-                for identifier in settings.tag_regex:
-                    if not settings.get_regex(identifier).search(line.strip()):
-                        if (
-                            settings.continued_matching
-                            and prev_match
-                            and line.startswith(settings.get_matching_pattern())
-                        ):
-                            to_decorate.setdefault(prev_match, []).append(reg)
-                        else:
-                            prev_match = str()
-                        continue
-                    prev_match = identifier
-                    to_decorate.setdefault(identifier, []).append(reg)
-                    break
-
-            for key in to_decorate:
-                tag = settings.tags.get(key)
-                self.view.add_regions(
-                    key=key.lower(),
-                    regions=to_decorate.get(key),
-                    scope=settings.get_scope_for_region(key, tag),
-                    icon=settings.get_icon(),
-                    flags=settings.get_flags(tag),
+        # Lines are split locally rather than calling split_by_newlines and
+        # substr for every line.
+        blocks = self.ReadCommentBlocks(
+            self.view.find_by_selector(comment_selector)
+        )
+        # Edits outside comments leave every block's text as it was, though
+        # edits above them shift where they are. Nothing to do as long as the
+        # view still shows what was drawn for them at their new offsets.
+        block_begins = tuple(region.begin() for region, _ in blocks)
+        comment_signature = hash((settings.revision, tuple(t for _, t in blocks)))
+        state = get_view_state(self.view)
+        if state.comment_signature == comment_signature:
+            if state.block_begins != block_begins:
+                self.RebaseAppliedRegions(state, block_begins)
+            if self.IsDecorated(state):
+                return
+
+        if settings.continued_matching:
+            to_decorate = self.FindContinuedTags(blocks)
+        else:
+            to_decorate = self.FindTags(blocks)
+
+        applied = state.applied_regions
+        decorated = dict()
+        for tag_id, regions in enumerate(to_decorate):
+            if not regions:
+                continue
+            key = settings.tag_names[tag_id]
+            region_key = key.lower()
+            scope = settings.scope_by_tag.get(key)
+            flags = settings.flags_by_tag.get(key)
+            extents = tuple((r.a, r.b) for r in regions)
+            signature = (scope, flags, settings.icon, extents)
+            decorated[region_key] = signature
+            # The view may have dropped or moved them since (e.g. by undo).
+            if applied.get(region_key) == signature and self.IsDrawn(
+                region_key, extents
+            ):
+                continue
+            self.view.add_regions(
+                key=region_key,
+                regions=regions,
+                scope=scope,
+                icon=settings.icon,
+                flags=flags,
+            )
+        for region_key in applied:
+            if region_key not in decorated:
+                self.view.erase_regions(region_key)
+        state.applied_regions = decorated
+        state.comment_signature = comment_signature
+        state.block_begins = block_begins
+
+    def RebaseAppliedRegions(self, state: ViewState, block_begins: tuple) -> None:
+        """Move recorded extents along with the comment blocks they lie in."""
+        old_begins = state.block_begins
+        rebased = dict()
+        for region_key, (scope, flags, icon, extents) in state.applied_regions.items():
+            moved = list()
+            for a, b in extents:
+                block = bisect.bisect_right(old_begins, a) - 1
+                delta = block_begins[block] - old_begins[block]
+                moved.append((a + delta, b + delta))
+            rebased[region_key] = (scope, flags, icon, tuple(moved))
+        state.applied_regions = rebased
+        state.block_begins = block_begins
+
+    def IsDecorated(self, state: ViewState) -> bool:
+        """Whether every key of the last pass is still drawn as recorded."""
+        return all(
+            self.IsDrawn(region_key, extents)
+            for region_key, (_, _, _, extents) in state.applied_regions.items()
+        )
+
+    def IsDrawn(self, region_key: str, extents: tuple) -> bool:
+        """Whether the view still shows exactly these regions under the key."""
+        return extents == tuple(
+            (r.a, r.b) for r in self.view.get_regions(region_key)
+        )
+
+    def ReadCommentBlocks(self, regions: list) -> list:
+        """Pair each comment region with its text, one substr per nearby run."""
+        blocks = list()
+        start = 0
+        while start < len(regions):
+            stop = start + 1
+            while (
+                stop < len(regions)
+                and regions[stop].begin() - regions[stop - 1].end() <= COMMENT_READ_GAP
+            ):
+                stop += 1
+            run_begin = regions[start].begin()
+            text = self.view.substr(sublime.Region(run_begin, regions[stop - 1].end()))
+            for region in regions[start:stop]:
+                blocks.append(
+                    (region, text[region.begin() - run_begin:region.end() - run_begin])
                 )
+            start = stop
+        return blocks
+
+    def CommentLines(self, blocks: list):
+        """Yield (begin, end, line, stripped) for every line of the blocks."""
+        for region, text in blocks:
+            lines = text.split("\n")
+            if text.endswith("\n"):
+                lines.pop()
+            offset = region.begin()
+            for line in lines:
+                # Regions are only built for lines that end up decorated.
+                begin, end = offset, offset + len(line)
+                offset = end + 1
+                yield begin, end, line, line.strip()
+
+    def FindTags(self, blocks: list) -> list:
+        """Tag matching only, for when continued matching is disabled."""
+        match_tag = settings.match_tag
+        to_decorate = [list() for _ in settings.tag_names]
+        for begin, end, _, stripped in self.CommentLines(blocks):
+            tag_id = match_tag(stripped)
+            if tag_id is not None:
+                to_decorate[tag_id].append(sublime.Region(begin, end))
+        return to_decorate
+
+    def FindContinuedTags(self, blocks: list) -> list:
+        """Tag matching that extends each tag to the continuation lines below it."""
+        match_tag = settings.match_tag
+        to_decorate = [list() for _ in settings.tag_names]
+        prev_match = None
+        matching_pattern = settings.get_matching_pattern()
+        strip_line = not matching_pattern.startswith(" ")
+        for begin, end, line, stripped in self.CommentLines(blocks):
+            if strip_line:
+                line = stripped
+            match = match_tag(stripped)
+            if match is not None:
+                prev_match = match
+                to_decorate[match].append(sublime.Region(begin, end))
+            elif prev_match is not None and line.startswith(matching_pattern):
+                to_decorate[prev_match].append(sublime.Region(begin, end))
+            else:
+                prev_match = None
+        return to_decorate
 
 
 class ColoredCommentsClearCommand(ColoredCommentsCommand, sublime_plugin.TextCommand):
@@ -7,9 +7,10 @@ def set_debug_logging(logging_enabled: bool) -> None:
     log_debug = logging_enabled
 
 
-def debug(msg: str) -> None:
+def debug(msg: str, *args) -> None:
+    # Arguments are only %-formatted when debug logging is enabled.
     if log_debug:
-        printf(msg)
+        printf(msg % args if args else msg)
 
 
 def printf(msg: str, prefix: str = "Colored Comments") -> None:
@@ -1,5 +1,6 @@
 import re
 from collections import OrderedDict
+from typing import Optional
 
 import sublime
 
@@ -46,14 +47,26 @@ default_tags = {
 class Settings(object):
     def __init__(self) -> None:
         self.debug = False
+        # Bumped on every settings (re)load
+        self.revision = 0
         self.continued_matching = True
         self.continued_matching_pattern = "-"
         self.comment_icon_enabled = True
         self.comment_icon = "dots"
-        self.disabled_syntax = list()
+        self.disabled_syntax = frozenset()
         self.tags = dict()
+        # Tag name -> compiled pattern, in priority order. Compiled once per
+        # settings load; consumers call pattern.match() directly.
         self.tag_regex = OrderedDict()
+        # Tag id (index into tag_regex) -> tag name
+        self.tag_names = list()
+        # All tag patterns as one alternation with a "t<id>" group per tag,
+        # or None when the patterns cannot be safely combined
+        self.combined_tag_regex = None
         self.region_keys = list()
+        self.icon = str()
+        self.scope_by_tag = dict()
+        self.flags_by_tag = dict()
 
     def get_icon(self) -> str:
         if self.comment_icon_enabled:
@@ -63,6 +76,19 @@ class Settings(object):
     def get_regex(self, identifier: str) -> re.Pattern:
         return self.tag_regex.get(identifier)
 
+    def match_tag(self, line: str) -> Optional[int]:
+        # Every tag pattern requires a blank after its identifier, so lines
+        # without one can skip the regex pass entirely.
+        if " " not in line and "\t" not in line:
+            return None
+        if self.combined_tag_regex:
+            found = self.combined_tag_regex.match(line)
+            return int(found.lastgroup[1:]) if found else None
+        for tag_id, regex in enumerate(self.tag_regex.values()):
+            if regex.match(line):
+                return tag_id
+        return None
+
     def get_matching_pattern(self):
         return self.continued_matching_pattern
 
@@ -151,6 +177,7 @@ def get_dict_setting(settings_obj: sublime.Settings, key: str, default: dict) ->
 
 
 def update_settings(settings: Settings, settings_obj: sublime.Settings) -> None:
+    settings.revision += 1
     settings.debug = get_boolean_setting(settings_obj, "debug", True)
     settings.continued_matching = get_boolean_setting(
         settings_obj, "continued_matching", True
@@ -164,13 +191,29 @@ def update_settings(settings: Settings, settings_obj: sublime.Settings) -> None:
     settings.comment_icon = "Packages/Colored Comments/icons/{}.png".format(
         get_str_setting(settings_obj, "comment_icon", "dots")
     )
-    settings.disabled_syntax = get_list_setting(
-        settings_obj, "disabled_syntax", [
-            "Packages/Text/Plain text.tmLanguage"]
+    settings.disabled_syntax = frozenset(
+        get_list_setting(
+            settings_obj, "disabled_syntax", ["Packages/Text/Plain text.tmLanguage"]
+        )
     )
-    settings.tags = get_dict_setting(settings_obj, "tags", default_tags)
-    settings.tag_regex = _generate_identifier_expression(settings.tags)
-    settings.region_keys = _generate_region_keys(settings.tags)
+    settings.icon = settings.get_icon()
+    tags = get_dict_setting(settings_obj, "tags", default_tags)
+    # The on-change hook fires for any key; only recompile when tags changed.
+    if tags != settings.tags:
+        settings.tags = tags
+        settings.tag_regex = _generate_identifier_expression(settings.tags)
+        settings.tag_names = list(settings.tag_regex)
+        settings.combined_tag_regex = _generate_combined_expression(
+            settings.tag_regex
+        )
+        settings.region_keys = _generate_region_keys(settings.tags)
+        settings.scope_by_tag = {
+            key: settings.get_scope_for_region(key, tag)
+            for key, tag in settings.tags.items()
+        }
+        settings.flags_by_tag = {
+            key: settings.get_flags(tag) for key, tag in settings.tags.items()
+        }
 
 
 def _generate_region_keys(tags: dict) -> list:
@@ -193,14 +236,16 @@ def _generate_identifier_expression(tags: dict) -> OrderedDict:
     identifiers = OrderedDict()
     for key, value in tags.items():
         priority = 2147483647
-        if value.get("priority", False):
+        if value.get("priority") is not None:
             tag_priority = value.get("priority")
             try:
-                tag_priority = int(priority)
+                tag_priority = int(tag_priority)
                 priority = tag_priority
-            except ValueError as ex:
+            except (TypeError, ValueError) as ex:
                 log.debug(
-                    f"[Colored Comments]: {_generate_identifier_expression.__name__} - {ex}"
+                    "[Colored Comments]: %s - %s",
+                    _generate_identifier_expression.__name__,
+                    ex,
                 )
         unordered_tags.setdefault(priority, list()).append(
             {"name": key, "settings": value}
@@ -213,9 +258,30 @@ def _generate_identifier_expression(tags: dict) -> OrderedDict:
                 if tag.get("settings").get("is_regex", False)
                 else escape_regex(tag.get("settings").get("identifier"))
             )
-            tag_identifier.append(")[ \t]+(?:.*)")
+            tag_identifier.append(")[ \t]+")
             flag = re.I if tag.get("settings").get("ignorecase", False) else 0
             identifiers[tag.get("name")] = re.compile(
                 "".join(tag_identifier), flags=flag
             )
     return identifiers
+
+
+def _generate_combined_expression(tag_regex: OrderedDict) -> Optional[re.Pattern]:
+    alternatives = list()
+    for tag_id, regex in enumerate(tag_regex.values()):
+        pattern = regex.pattern
+        if regex.flags & re.I:
+            pattern = "(?i:{})".format(pattern)
+        alternatives.append("(?P<t{}>{})".format(tag_id, pattern))
+    try:
+        combined = re.compile("|".join(alternatives))
+    except re.error as ex:
+        log.debug(
+            "[Colored Comments]: %s - %s", _generate_combined_expression.__name__, ex
+        )
+        return None
+    # User identifiers with their own groups (and backreferences) or inline
+    # global flags would change meaning once merged; keep per-tag matching.
+    if combined.groups != 2 * len(tag_regex) or combined.flags != re.U:
+        return None
+    return combined